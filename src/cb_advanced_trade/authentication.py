@@ -1,33 +1,84 @@
 # -*- coding: UTF-8 -*-
 
-from abc import ABC, abstractmethod
+from functools import lru_cache
 from hashlib import sha256
 from hmac import HMAC
-from typing import List
+from time import time_ns
+from typing import Union, MutableMapping
+from warnings import warn
 
 from requests.auth import AuthBase
 from requests.models import PreparedRequest
-from requests.utils import to_native_string
 
-from .utils import encode, decode, get_posix
+from .utils import encode, encode_utf8
 
 
-class HMACBase(ABC):
+@lru_cache(maxsize=None)
+def _check_openssl():
+    """Warn (once) if `hashlib` is not backed by the OpenSSL C implementation."""
+    if sha256().__class__.__module__ != "_hashlib":
+        warn(
+            "hashlib is not using OpenSSL, HMAC signing falls back to a "
+            "slower implementation!",
+            RuntimeWarning,
+            stacklevel=3
+        )
+
+
+class HMACBase(object):
     """Base HMAC authentication signature handler."""
 
+    __slots__ = ("_key", "__secret", "__hmac")
+
+    def __init__(self, key: str, secret: str):
+        _check_openssl()
+        self._key = key
+        self.__secret = encode_utf8(secret)
+        # keyed once, copied for every signature:
+        self.__hmac = HMAC(self.__secret, digestmod=sha256)
+
     @staticmethod
-    def _sign(secret: str, message: str) -> str:
+    def _timestamp() -> int:
+        """POSIX timestamp in whole seconds."""
+        return time_ns() // 1_000_000_000
+
+    @staticmethod
+    def _pre_hash(timestamp: int, method: str, path: Union[str, bytes], body: bytes = None) -> bytes:
         """
-        Create a sha256 HMAC and sign the required `message` using the
-        API base64 decoded secret as `key`.
+        Create the pre-hash bytes by concatenating the timestamp with
+        the request method, path and body if not None.
         """
-        return HMAC(
-            encode(secret, "UTF-8"),
-            encode(message, "UTF-8"),
-            digestmod=sha256
-        ).hexdigest()
+        return b"%d%s%s%s" % (
+            timestamp,
+            encode_utf8(method),
+            encode_utf8(path),
+            body or b"",
+        )
+
+    def _sign(self, message: bytes) -> str:
+        """
+        Sign the required `message` with a copy of the sha256 HMAC keyed
+        with the API secret.
+        """
+        hmac = self.__hmac.copy()
+        hmac.update(message)
+        return hmac.digest().hex()
+
+    def _sign_headers(self, headers: MutableMapping, method: str, path: Union[str, bytes], body: bytes = None):
+        """Set the `CB-ACCESS-*` headers of a REST request."""
+        timestamp = self._timestamp()
+
+        message = self._pre_hash(
+            timestamp=timestamp,
+            method=method.upper(),
+            path=path,
+            body=body
+        )
+
+        headers["CB-ACCESS-KEY"] = self._key
+        headers["CB-ACCESS-SIGN"] = self._sign(message)
+        headers["CB-ACCESS-TIMESTAMP"] = str(timestamp)
 
-    @abstractmethod
     def sign(self, *args, **kwargs):
         raise NotImplementedError
 
@@ -35,76 +86,76 @@ class HMACBase(ABC):
 class SessionAuth(AuthBase, HMACBase):
     """Session HMAC authentication handler."""
 
-    @staticmethod
-    def _pre_hash(timestamp: str, method: str, path: str, body: str = None) -> str:
-        """
-        Create the pre-hash string by concatenating the timestamp with
-        the request method, path and body if not None.
-        """
-        if body is not None:
-            return f"{timestamp}{method}{path}{body}"
-        return f"{timestamp}{method}{path}"
-
-    @staticmethod
-    def _as_dict(key: str, signature: str, timestamp: str) -> dict:
-        return {
-            "CB-ACCESS-KEY": to_native_string(key),
-            "CB-ACCESS-SIGN": to_native_string(signature),
-            "CB-ACCESS-TIMESTAMP": to_native_string(timestamp),
-        }
-
-    def __init__(self, key: str, secret: str):
-        self.__key = key
-        self.__secret = secret
+    __slots__ = ()
 
     def __call__(self, request: PreparedRequest):
         self.sign(request)
         return request
 
     def sign(self, request: PreparedRequest):
-        timestamp = str(int(get_posix()))
-
-        message = self._pre_hash(
-            timestamp=timestamp,
-            method=request.method.upper(),
-            path=request.path_url.split("?")[0],
-            body=decode(request.body, encoding="UTF-8")
+        self._sign_headers(
+            headers=request.headers,
+            method=request.method,
+            path=request.path_url.partition("?")[0],
+            body=encode(request.body, encoding="UTF-8")
         )
 
-        headers = self._as_dict(
-            key=self.__key,
-            signature=self._sign(self.__secret, message),
-            timestamp=timestamp,
-        )
 
-        request.headers.update(headers)
+class ClientAuth(HMACBase):
+    """`httpx` client HMAC authentication handler."""
+
+    __slots__ = ()
+
+    def __call__(self, request):
+        self.sign(request)
+        return request
+
+    def sign(self, request):
+        self._sign_headers(
+            headers=request.headers,
+            method=request.method,
+            path=request.url.raw_path.partition(b"?")[0],
+            body=request.content
+        )
 
 
 class WSAuth(HMACBase):
     """Websocket HMAC authentication handler."""
 
+    __slots__ = ()
+
     @staticmethod
-    def _pre_hash(timestamp: str, channel: str, product_ids: List[str]) -> str:
-        return f"{timestamp}{channel}{','.join(product_ids)}"
+    def _pre_hash(timestamp: int, channel: str, product_ids: str) -> bytes:
+        return b"%d%s%s" % (
+            timestamp,
+            encode_utf8(channel),
+            encode_utf8(product_ids),
+        )
 
-    def __init__(self, key: str, secret: str):
-        self.__key = key
-        self.__secret = secret
+    def sign(self, params: dict, product_ids: str = None):
+        """
+        Sign the subscription `params` in place.
 
-    def sign(self, params: dict):
-        timestamp = str(int(get_posix()))
+        :param params: The subscribe message parameters.
+        :param product_ids: The comma-joined product IDs, if already known
+            by the caller (computed from `params` otherwise).
+        """
+        timestamp = self._timestamp()
+
+        if product_ids is None:
+            product_ids = ",".join(params.get("product_ids"))
 
         message = self._pre_hash(
             timestamp=timestamp,
             channel=params.get("channel"),
-            product_ids=params.get("product_ids")
+            product_ids=product_ids
         )
 
         params.update(
-            api_key=self.__key,
-            timestamp=timestamp,
-            signature=self._sign(self.__secret, message),
+            api_key=self._key,
+            timestamp=str(timestamp),
+            signature=self._sign(message),
         )
 
 
-__all__ = ["SessionAuth", "WSAuth"]
+__all__ = ["SessionAuth", "ClientAuth", "WSAuth"]
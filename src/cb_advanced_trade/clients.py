@@ -0,0 +1,150 @@
+# -*- coding: UTF-8 -*-
+
+from logging import getLogger, Logger, DEBUG
+from os import environ
+from typing import Callable, Any
+from warnings import warn
+
+from httpx import Client, HTTPTransport, Limits, Response
+
+from .authentication import ClientAuth
+from .constants import TRACE
+from .utils import get_logger, decode_utf8, dumps
+
+
+class AuthClient(Client):
+    """
+    HTTP/2 `Client` handler.
+
+    Alternative to `AuthSession` which multiplexes the requests over a
+    single connection. Requires the optional `httpx[http2]` dependency.
+    """
+
+    _log: Logger = getLogger(__name__)
+
+    @staticmethod
+    def extract_data(response: Response) -> str:
+        """Request/response dump, in the `requests_toolbelt` format."""
+        request = response.request
+        lines = [f"< {request.method} {decode_utf8(request.url.raw_path)} {response.http_version}"]
+        lines.extend(f"< {name}: {value}" for name, value in request.headers.items())
+        lines.extend(["<", decode_utf8(request.content), ""])
+        lines.append(f"> {response.http_version} {response.status_code} {response.reason_phrase}")
+        lines.extend(f"> {name}: {value}" for name, value in response.headers.items())
+        lines.extend([">", response.text])
+        return "\r\n".join(lines)
+
+    def __init__(
+            self,
+            key: str,
+            secret: str,
+            retries: int = 3,
+            timeout: int = 30,
+            pool_size: int = 32,
+            json_serializer: Callable[[Any], bytes] = None,
+            debug: bool = False,
+            logger: Logger = None,
+            cache: bool = None,
+            cache_backend: str = None,
+            expire_after: int = None,
+            backoff: int = None,
+    ):
+        """
+        :param key: The API key;
+        :param secret: The API secret;
+        :param retries: Total number of connection retries to allow
+            (defaults to: 3).
+        :param timeout: How long to wait for the server to send data before
+            giving up (defaults to: 30).
+        :param pool_size: Number of keep-alive connections to pool
+            (defaults to: 32).
+        :param json_serializer: Serializes the `json` request bodies to
+            `bytes` (defaults to: `orjson.dumps` if installed, else a compact
+            `json.dumps`).
+        :param debug: Set to True to log all requests/responses to/from server
+            (defaults to: ``False``).
+        :param logger: The handler to be used for logging. If given, and level
+            is above `DEBUG`, all debug messages will be ignored.
+        :param cache: Not supported, accepted for `AuthSession` compatibility;
+        :param cache_backend: Not supported, as above;
+        :param expire_after: Not supported, as above;
+        :param backoff: Not supported, as above.
+        """
+        ignored = [
+            name for name, value in (
+                ("cache", cache),
+                ("cache_backend", cache_backend),
+                ("expire_after", expire_after),
+                ("backoff", backoff),
+            )
+            if value not in (None, False)
+        ]
+
+        if ignored:
+            warn(
+                f"The HTTP/2 client does not support {', '.join(ignored)}, ignored!",
+                RuntimeWarning,
+                stacklevel=3
+            )
+
+        limits = Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size
+        )
+
+        super(AuthClient, self).__init__(
+            auth=ClientAuth(key, secret),
+            headers={
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+                "Accept-Charset": "utf-8",
+            },
+            timeout=timeout,
+            limits=limits,
+            http2=True,
+            transport=HTTPTransport(http2=True, limits=limits, retries=retries),
+        )
+
+        self._serializer = json_serializer or dumps
+
+        if debug is True:
+            self.event_hooks["response"] = [self.trace if environ.get(TRACE) == "1" else self.debug]
+
+        if logger is not None:
+            self._log = logger
+
+        elif debug is True:
+            self._log = get_logger(__name__, debug=True)
+
+    def request(self, method: str, url, *, content=None, data=None, json: Any = None, **kwargs) -> Response:
+        if json is not None:
+            content = self._serializer(json)
+
+        # pre-serialized bodies, as accepted by `requests`:
+        elif isinstance(data, (bytes, str)):
+            content, data = data, None
+
+        return super(AuthClient, self).request(method, url, content=content, data=data, **kwargs)
+
+    def debug(self, response: Response):
+        if not self._log.isEnabledFor(DEBUG):
+            return
+        self._log.debug(
+            "%s %s -> %d %s",
+            response.request.method,
+            response.url,
+            response.status_code,
+            response.http_version
+        )
+
+    def trace(self, response: Response):
+        """Log the full request/response dump."""
+        if not self._log.isEnabledFor(DEBUG):
+            return
+        response.read()
+        self._log.debug(
+            msg=self.extract_data(response)
+        )
+
+
+__all__ = ["AuthClient"]
@@ -1,11 +1,30 @@
 # -*- coding: UTF-8 -*-
 
+from functools import lru_cache
+from os import getcwd
 from os.path import dirname, join, realpath
 from sys import modules
 
-ROOT: str = dirname(realpath(modules["__main__"].__file__))
 
-CACHE: str = join(ROOT, "cache", "cb_advanced_trade")
+@lru_cache(maxsize=None)
+def _root() -> str:
+    """
+    Directory of the running `__main__` script, or the current working
+    directory when there is none (REPL, notebooks, etc).
+    """
+    main = getattr(modules["__main__"], "__file__", None)
+    if main is None:
+        return getcwd()
+    return dirname(realpath(main))
+
+
+def cache_dir() -> str:
+    """Path of the `requests-cache` storage."""
+    return join(_root(), "cache", "cb_advanced_trade")
+
+
+# set to "1" to dump full requests/responses in debug mode:
+TRACE: str = "CB_ADVANCED_TRADE_TRACE"
 
 ADVANCED_TRADE: str = "api.coinbase.com"
 
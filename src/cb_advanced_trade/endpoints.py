@@ -1,38 +1,39 @@
 # -*- coding: UTF-8 -*-
 
-from abc import ABC
-from json import JSONDecodeError
+from functools import partial
 from typing import List
 
 from requests import Response, HTTPError
 
 from .constants import API, ADVANCED_TRADE, ENDPOINTS
 from .sessions import AuthSession
+from .utils import loads
 
 
-class AdvancedTrade(ABC):
+class AdvancedTrade(object):
     """Advanced Trade API authenticated base endpoint."""
 
     _url = f"https://{ADVANCED_TRADE}/{API}"
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # user subclasses (not in `ENDPOINTS`) inherit both from their base:
+        if cls.__name__ in ENDPOINTS:
+            cls._endpoint = ENDPOINTS[cls.__name__]
+            cls._endpoint_url = f"{cls._url}/{cls._endpoint}"
+
     @staticmethod
-    def _join(*args, **kwargs) -> str:
+    def _join(*args) -> str:
         """
-        Construct  an url address using `args` for path and `kwargs` as
-        query params if given.
+        Construct an url address using `args` for path (query params are
+        passed to the session as `params`).
         """
-        url = "/".join(args)
-        if len(kwargs) > 0:
-            url = f"{url}?{'&'.join(f'{key}={value}' for key, value in kwargs.items())}"
-        return url
+        return "/".join(args)
 
     @staticmethod
     def _error_side(status: int) -> str:
-        if 400 <= status < 500:
-            return "Client"
-
-        if 500 <= status < 600:
-            return "Server"
+        bucket = status // 100
+        return "Client" if bucket == 4 else "Server" if bucket == 5 else None
 
     def __init__(self, key: str, secret: str, **kwargs):
         """
@@ -40,18 +41,38 @@ class AdvancedTrade(ABC):
             - ``key``: The API key;
             - ``secret``: The API secret;
             - ``cache``: Use caching (defaults to: `True`);
+            - ``cache_backend``: The cache backend, one of `memory`, `sqlite`
+              or `filesystem` (defaults to: `memory`);
+            - ``expire_after``: Number of seconds after which cached responses
+              expire (defaults to: 180);
             - ``retries``: Total number of retries to allow (defaults to: 3);
             - ``backoff``: A backoff factor to apply between attempts after
               the second try (defaults to: 1);
             - ``timeout``: How long to wait for the server to send data before
               giving up (defaults to: 30);
+            - ``pool_size``: Number of keep-alive connections to pool per
+              host (defaults to: 32);
+            - ``http2``: bool - Use the `httpx` HTTP/2 client instead of a
+              `requests` session (defaults to: `False`). Requires the `http2`
+              extra; `cache`, `cache_backend`, `expire_after` and `backoff`
+              are ignored, with a warning, when given.
+            - ``json_serializer``: Callable - Serializes request bodies to
+              `bytes` (defaults to: `orjson.dumps` if installed, else a
+              compact `json.dumps`);
             - ``debug``: bool - Set to True to log all requests/responses
               to/from server (defaults to: `False`).
             - ``logger``: Logger - The handler to be used for logging.
               If given, and level is above `DEBUG`, all debug messages will be
               ignored.
         """
-        self._session = AuthSession(key, secret, **kwargs)
+        if kwargs.pop("http2", False) is True:
+            # `httpx` is an optional dependency:
+            from .clients import AuthClient
+            self._session = AuthClient(key, secret, **kwargs)
+        else:
+            self._session = AuthSession(key, secret, **kwargs)
+        self._get = partial(self._request, self._session.get)
+        self._post = partial(self._request, self._session.post)
 
     def __enter__(self):
         return self
@@ -63,40 +84,35 @@ class AdvancedTrade(ABC):
         """Closes all adapters and as such the session"""
         self._session.close()
 
-    def _get_endpoint_name(self) -> str:
-        return ENDPOINTS.get(self.__class__.__name__)
-
-    def _get(self, *args, **kwargs):
-        return self._request(self._session.get, *args, **kwargs)
-
-    def _post(self, *args, **kwargs):
-        return self._request(self._session.post, *args, **kwargs)
-
     def _request(self, method, *args, **kwargs):
         kwargs.update(
-            url=self._join(self._url, self._get_endpoint_name(), *args)
+            url=self._join(self._endpoint_url, *args)
         )
         response = method(**kwargs)
+        try:
+            content: dict = loads(response.content)
+        except ValueError:
+            # non-JSON (i.e. proxy) error pages, same error for both clients:
+            if response.status_code >= 400:
+                self._raise_for_status(response, {})
+            raise
         if response.status_code != 200:
-            self._raise_for_status(response)
-        return response.json()
+            self._raise_for_status(response, content)
+        return content
 
-    def _raise_for_status(self, response: Response):
-        try:
-            error: dict = response.json()
-        except JSONDecodeError:
-            response.raise_for_status()
-        else:
-            status: int = response.status_code
-            message: str = error.get("message").rstrip(".?!")
-            side: str = self._error_side(status)
+    def _raise_for_status(self, response: Response, error: dict):
+        status: int = response.status_code
+        message: str = error.get("message")
+        side: str = self._error_side(status)
 
-            if message is None:
-                message: str = response.reason or "Unknown"
+        if message is None:
+            # `reason_phrase` for `httpx` responses:
+            reason: str = getattr(response, "reason", None) or getattr(response, "reason_phrase", None)
+            message: str = reason or "Unknown"
 
-            raise HTTPError(
-                f"{status} {side} Error: {message}! URL: {response.url}"
-            )
+        raise HTTPError(
+            f"{status} {side} Error: {message.rstrip('.?!')}! URL: {response.url}"
+        )
 
 
 class Accounts(AdvancedTrade):
@@ -1,16 +1,18 @@
 # -*- coding: UTF-8 -*-
 
-from logging import getLogger, Logger, StreamHandler, Formatter, DEBUG, INFO
+from logging import getLogger, Logger, DEBUG
+from os import environ
+from typing import Callable, Any
 
-from requests import Session, Response
+from requests import Response
 from requests.adapters import HTTPAdapter
-from requests_cache import install_cache
+from requests_cache import CachedSession
 from requests_toolbelt.utils import dump
 from urllib3.util.retry import Retry
 
 from .authentication import SessionAuth
-from .constants import CACHE
-from .utils import decode
+from .constants import cache_dir, TRACE
+from .utils import decode_utf8, get_logger, dumps
 
 
 class TimeoutHTTPAdapter(HTTPAdapter):
@@ -25,53 +27,50 @@ class TimeoutHTTPAdapter(HTTPAdapter):
         return super(TimeoutHTTPAdapter, self).send(request, **kwargs)
 
 
-class AuthSession(Session):
+class AuthSession(CachedSession):
     """Base `Session` handler."""
 
-    # create a logger and set level to debug:
     _log: Logger = getLogger(__name__)
-    _log.setLevel(INFO)
-
-    # create console handler and set level to debug:
-    _console = StreamHandler()
-    _console.setLevel(INFO)
-
-    # create formatter:
-    _formatter = Formatter(
-        "[%(asctime)s] - %(levelname)s - <%(filename)s, %(lineno)d, %(funcName)s>: %(message)s"
-    )
-
-    # add formatter to console:
-    _console.setFormatter(_formatter)
-
-    # add console to logger:
-    _log.addHandler(_console)
 
     @staticmethod
-    def timeout_http_adapter(retries: int, backoff: int, timeout: int) -> TimeoutHTTPAdapter:
+    def timeout_http_adapter(
+            retries: int,
+            backoff: int,
+            timeout: int,
+            pool_connections: int = 32,
+            pool_maxsize: int = 32
+    ) -> TimeoutHTTPAdapter:
         return TimeoutHTTPAdapter(
             max_retries=Retry(
                 total=retries,
-                backoff_factor=backoff
+                backoff_factor=backoff,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(["GET", "POST", "DELETE"]),
+                respect_retry_after_header=True,
+                raise_on_status=False,
             ),
-            timeout=timeout
+            timeout=timeout,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=False,
         )
 
     @staticmethod
     def extract_data(response: Response) -> str:
-        return decode(
-            dump.dump_all(response),
-            encoding="UTF-8"
-        )
+        return decode_utf8(dump.dump_all(response))
 
     def __init__(
             self,
             key: str,
             secret: str,
             cache: bool = True,
+            cache_backend: str = "memory",
+            expire_after: int = 180,
             retries: int = 3,
             backoff: int = 1,
             timeout: int = 30,
+            pool_size: int = 32,
+            json_serializer: Callable[[Any], bytes] = None,
             debug: bool = False,
             logger: Logger = None
     ):
@@ -79,21 +78,44 @@ class AuthSession(Session):
         :param key: The API key;
         :param secret: The API secret;
         :param cache: Use caching (defaults to: `True`);
+        :param cache_backend: The cache backend, one of `memory`, `sqlite`
+            or `filesystem` (defaults to: `memory`);
+        :param expire_after: Number of seconds after which cached responses
+            expire (defaults to: 180);
         :param retries: Total number of retries to allow (defaults to: 3).
         :param backoff: A backoff factor to apply between attempts after the
             second try (defaults to: 1).
         :param timeout: How long to wait for the server to send data before
             giving up (defaults to: 30).
+        :param pool_size: Number of keep-alive connections to pool per host
+            (defaults to: 32).
+        :param json_serializer: Serializes the `json` request bodies to
+            `bytes` (defaults to: `orjson.dumps` if installed, else a compact
+            `json.dumps`).
         :param debug: Set to True to log all requests/responses to/from server
             (defaults to: ``False``).
         :param logger: The handler to be used for logging. If given, and level
             is above `DEBUG`, all debug messages will be ignored.
         """
 
-        if cache is True:
-            install_cache(cache_name=CACHE, backend="sqlite", expire_after=180)
+        backend_options: dict = {}
+
+        if cache is not True:  # nothing to persist, don't touch the disk
+            cache_backend = "memory"
+
+        elif cache_backend == "sqlite":
+            backend_options.update(fast_save=True)
+
+        super(AuthSession, self).__init__(
+            cache_name="cb_advanced_trade" if cache_backend == "memory" else cache_dir(),
+            backend=cache_backend,
+            expire_after=expire_after,
+            allowable_methods=("GET",),
+            **backend_options
+        )
 
-        super(AuthSession, self).__init__()
+        # the cache lives with this session only, it can just be switched off:
+        self.settings.disabled = cache is not True
 
         self.auth = SessionAuth(key, secret)
 
@@ -102,28 +124,64 @@ class AuthSession(Session):
                 "Accept": "application/json",
                 "Content-Type": "application/json",
                 "Accept-Charset": "utf-8",
+                "Connection": "keep-alive",
             }
         )
 
         self.mount(
             "http://",
-            self.timeout_http_adapter(retries, backoff, timeout)
+            self.timeout_http_adapter(retries, backoff, timeout, pool_size, pool_size)
         )
 
         self.mount(
             "https://",
-            self.timeout_http_adapter(retries, backoff, timeout)
+            self.timeout_http_adapter(retries, backoff, timeout, pool_size, pool_size)
         )
 
+        self._serializer = json_serializer or dumps
+
+        # logged from `send()`: `CachedSession` dispatches response hooks twice
+        self._debug_hook = None
+
         if debug is True:
-            self.hooks["response"] = [self.debug]
-            self._log.setLevel(DEBUG)
-            self._console.setLevel(DEBUG)
+            self._debug_hook = self.trace if environ.get(TRACE) == "1" else self.debug
 
         if logger is not None:
             self._log = logger
 
+        elif debug is True:
+            self._log = get_logger(__name__, debug=True)
+
+    def request(self, method: str, url: str, *args, json: Any = None, **kwargs) -> Response:
+        if json is not None:
+            kwargs.update(data=self._serializer(json))
+        return super(AuthSession, self).request(method, url, *args, **kwargs)
+
+    def send(self, request, **kwargs) -> Response:
+        response = super(AuthSession, self).send(request, **kwargs)
+        if self._debug_hook is not None:
+            self._debug_hook(response)
+        return response
+
     def debug(self, response: Response, *args, **kwargs):
+        if not self._log.isEnabledFor(DEBUG):
+            return
+        self._log.debug(
+            "%s %s -> %d (%dB, %.0fms)",
+            response.request.method,
+            response.url,
+            response.status_code,
+            len(response.content),
+            response.elapsed.total_seconds() * 1000
+        )
+
+    def trace(self, response: Response, *args, **kwargs):
+        """Log the full request/response dump."""
+        if not self._log.isEnabledFor(DEBUG):
+            return
+        if getattr(response, "from_cache", False) is True:
+            # cached responses have no connection to dump:
+            return self.debug(response)
         self._log.debug(
             msg=self.extract_data(response)
         )
@@ -1,17 +1,50 @@
 # -*- coding: UTF-8 -*-
 
+from collections import deque
 from datetime import datetime, timezone
-from queue import Queue
-from typing import Union, List, Tuple
+from logging import getLogger, Logger, StreamHandler, Formatter, DEBUG
+from queue import Full
+from struct import Struct
+from sys import version_info
+from threading import Event, Lock
+from time import sleep, monotonic
+from typing import Union, Tuple, Sequence, Optional, Any
 
+try:
+    from orjson import loads, dumps
+except ImportError:
+    from json import loads, dumps as _dumps
 
-def get_posix() -> float:
+    def dumps(value: Any) -> bytes:
+        """Serialize `value` to a compact JSON formatted `bytes` object."""
+        return _dumps(value, separators=(",", ":"), ensure_ascii=False).encode("UTF-8")
+
+
+def get_logger(name: str, debug: bool = False) -> Logger:
     """
-    POSIX timestamp as float.
-    Number of seconds since Unix Epoch in UTC.
+    The `name` logger or, in debug mode, its `debug` child logger set to
+    `DEBUG` with a console handler. The handler is only attached once, so
+    re-creating clients (or reloading modules) won't duplicate log lines.
     """
-    utc = get_utc()
-    return utc.timestamp()
+    logger = getLogger(name)
+
+    if debug is not True:
+        return logger
+
+    logger = logger.getChild("debug")
+
+    if not logger.handlers:
+        console = StreamHandler()
+        console.setFormatter(
+            Formatter(
+                "[%(asctime)s] - %(levelname)s - <%(filename)s, %(lineno)d, %(funcName)s>: %(message)s"
+            )
+        )
+        logger.addHandler(console)
+        logger.setLevel(DEBUG)
+        logger.propagate = False
+
+    return logger
 
 
 def get_utc() -> datetime:
@@ -33,31 +66,273 @@ def decode(value: Union[bytes, str], encoding: str = "UTF-8") -> str:
     return value
 
 
-def as_list(values: Union[List[str], Tuple[str], str]) -> List[str]:
-    """Return values as a list object."""
-    if isinstance(values, tuple):
-        return list(values)
+def encode_utf8(value: Union[str, bytes]) -> bytes:
+    """UTF-8 specialization of `encode`."""
+    if type(value) is bytes:
+        return value
+    return value.encode()
+
+
+def decode_utf8(value: Union[bytes, bytearray, str]) -> str:
+    """UTF-8 specialization of `decode`."""
+    if type(value) is str:
+        return value
+    return value.decode()
+
+
+def as_tuple(values: Union[Sequence[str], str]) -> Tuple[str, ...]:
+    """Return values as a tuple object."""
     if isinstance(values, str):
-        return [values]
-    return values
+        return values,
+    if isinstance(values, tuple):
+        return values
+    return tuple(values)
 
 
-class WSQueue(Queue):
-    SENTINEL = object()
+class WSQueue(object):
+    """
+    Single producer, single consumer queue of websocket messages.
+
+    `deque.append` and `deque.popleft` are atomic, so items are never
+    guarded by a lock; the events only wake up the consumer and signal
+    the shutdown.
+    """
+
+    def __init__(self):
+        self._items = deque()
+        self._ready = Event()
+        self._closed = Event()
+
+    def put(self, item: Any):
+        self._items.append(item)
+        self._ready.set()
 
     def close(self):
-        self.put(self.SENTINEL)
+        self._closed.set()
+        self._ready.set()
+
+    def drain(self) -> list:
+        """Pop and return all the pending items without blocking."""
+        items = []
+
+        while self._items:
+            items.append(self._items.popleft())
+
+        return items
 
     def __iter__(self):
         while True:
-            item = self.get()
+            self._ready.wait()
+            self._ready.clear()
+
+            # read before draining: whatever was put before `close()` is
+            # in the deque by now, so nothing is left behind on exit
+            closed = self._closed.is_set()
+
+            while self._items:
+                yield self._items.popleft()
+
+            if closed is True:  # exit signal, after the backlog
+                return
+
+
+# `SHMRingQueue` attaches swap `resource_tracker.register` (Python < 3.13):
+_tracker_lock = Lock()
+
+
+class SHMRingQueue(object):
+    """
+    Single producer, single consumer ring buffer of raw JSON frames in
+    shared memory, for consumers running in another process.
+
+    Frames are length-prefixed and the header holds the `head` (written by
+    the producer only) and `tail` (written by the consumer only) byte
+    counters, so, like `WSQueue`, it needs no lock. Decoding is left to
+    the consumer: `get()` returns the raw frame, iterating `loads` it.
+
+    The producer creates the buffer, the consumer attaches to it by `name`:
+
+        queue = SHMRingQueue.attach(name)
+
+    Python has no memory fences: a frame is published by storing `head`
+    after the frame bytes, which relies on the CPU keeping stores in
+    order, as x86/x86-64 do. On weakly ordered CPUs (i.e. ARM) the
+    consumer may, rarely, read a frame before all of its bytes land.
+
+    Requires Python 3.8 or newer (`multiprocessing.shared_memory`).
+    """
+
+    # head, tail, closed flag and capacity as native 64-bit words:
+    _header: int = 32
+    _prefix: Struct = Struct("<I")
+
+    # consumer (and full buffer) polling interval bounds, in seconds:
+    _min_wait: float = 0.0001
+    _max_wait: float = 0.01
+
+    def __init__(self, size: int = 64 << 20, name: str = None, create: bool = True):
+        from multiprocessing.shared_memory import SharedMemory
+
+        if create is True:
+            self._shm = SharedMemory(name=name, create=True, size=self._header + size)
+        else:
+            self._shm = self._untracked(name)
 
+        self._words = self._shm.buf[:self._header].cast("Q")
+
+        if create is True:
+            self._words[0] = self._words[1] = self._words[2] = 0
+            self._words[3] = size
+
+        self._capacity = self._words[3]
+        self._data = self._shm.buf[self._header:self._header + self._capacity]
+        self._owner = create
+        self._released = False
+
+    @staticmethod
+    def _untracked(name: str):
+        """
+        Attach to `name` without handing it over to this process' resource
+        tracker, which would unlink it when the consumer exits.
+        """
+        from multiprocessing import resource_tracker
+        from multiprocessing.shared_memory import SharedMemory
+
+        if version_info >= (3, 13):
+            return SharedMemory(name=name, track=False)
+
+        # skip the registration rather than undo it later: the tracker may be
+        # shared with the producer (same process, or its child) and must keep
+        # the producer's own entry
+        register = resource_tracker.register
+
+        def untracked(resource: str, rtype: str):
+            if rtype != "shared_memory" or resource.lstrip("/") != name.lstrip("/"):
+                register(resource, rtype)
+
+        with _tracker_lock:
+            resource_tracker.register = untracked
             try:
-                if item is self.SENTINEL:  # exit signal
-                    return
-                yield item
+                return SharedMemory(name=name)
             finally:
-                self.task_done()
+                resource_tracker.register = register
+
+    @classmethod
+    def attach(cls, name: str) -> "SHMRingQueue":
+        """Open an existing ring buffer, on the consumer side."""
+        return cls(name=name, create=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def put(self, frame: bytes, timeout: Optional[float] = 1.0):
+        """
+        Append `frame`, waiting up to `timeout` seconds (`None` for no limit)
+        for the consumer while the buffer is full, then raise `queue.Full`.
+        """
+        size = self._prefix.size + len(frame)
+
+        if size > self._capacity:
+            raise ValueError(f"Frame of {len(frame)} bytes exceeds the ring buffer!")
+
+        head, wait = self._words[0], self._min_wait
+        deadline = None if timeout is None else monotonic() + timeout
+
+        while self._capacity - (head - self._words[1]) < size:
+            if deadline is not None and monotonic() >= deadline:
+                raise Full(f"Ring buffer full for {timeout} seconds!")
+
+            sleep(wait)
+            wait = min(wait * 2, self._max_wait)
+
+        self._write(head, self._prefix.pack(len(frame)))
+        self._write(head + self._prefix.size, frame)
+        self._words[0] = head + size  # publish, after the frame is in place
+
+    def get(self) -> Optional[bytes]:
+        """Pop the next frame, waiting for one; `None` once closed and drained."""
+        tail, wait = self._words[1], self._min_wait
+
+        while self._words[0] == tail:
+            if self._words[2] and self._words[0] == tail:
+                return None
+
+            sleep(wait)
+            wait = min(wait * 2, self._max_wait)
+
+        length, = self._prefix.unpack(self._read(tail, self._prefix.size))
+        frame = self._read(tail + self._prefix.size, length)
+        self._words[1] = tail + self._prefix.size + length
+        return frame
+
+    def close(self):
+        """Signal the consumer that no more frames will follow."""
+        self._words[2] = 1
+
+    def release(self):
+        """Unmap the buffer, removing it as well on the producer side."""
+        if self._released is True:
+            return
+
+        self._unmap()
+
+        if self._owner is True:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:  # removed by a consumer's resource tracker
+                pass
+
+    def _unmap(self):
+        self._released = True
+        self._words.release()
+        self._data.release()
+        self._shm.close()
+
+    def __del__(self):
+        # the views must go before `SharedMemory.__del__` closes the mapping:
+        if getattr(self, "_released", True) is False:
+            self._unmap()
+
+    def _write(self, position: int, value: bytes):
+        start = position % self._capacity
+        end = start + len(value)
+
+        if end <= self._capacity:
+            self._data[start:end] = value
+        else:  # wraps around
+            split = self._capacity - start
+            self._data[start:] = value[:split]
+            self._data[:end - self._capacity] = value[split:]
+
+    def _read(self, position: int, length: int) -> bytes:
+        start = position % self._capacity
+        end = start + length
+
+        if end <= self._capacity:
+            return self._data[start:end].tobytes()
+
+        return self._data[start:].tobytes() + self._data[:end - self._capacity].tobytes()
+
+    def __iter__(self):
+        while True:
+            frame = self.get()
+
+            if frame is None:
+                return
+
+            yield loads(frame)
 
 
-__all__ = ["get_posix", "encode", "decode", "WSQueue", "as_list"]
+__all__ = [
+    "get_logger",
+    "encode",
+    "decode",
+    "encode_utf8",
+    "decode_utf8",
+    "WSQueue",
+    "SHMRingQueue",
+    "as_tuple",
+    "loads",
+    "dumps",
+]
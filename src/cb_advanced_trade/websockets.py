@@ -1,45 +1,46 @@
 # -*- coding: UTF-8 -*-
 
-from json import loads, dumps
-from logging import getLogger, Logger, StreamHandler, Formatter, DEBUG, INFO
-from threading import Thread
-from typing import Union, List, Tuple
+from logging import getLogger, Logger
+from queue import Full
+from random import uniform
+from socket import socket, create_connection, SHUT_RDWR
+from ssl import create_default_context
+from threading import Thread, Timer, Lock
+from typing import Union, Sequence, Tuple, Optional, Callable, Iterable
+from urllib.parse import urlsplit
+from warnings import warn
 
 from websocket import WebSocketApp
 
 from .authentication import WSAuth
 from .constants import MARKET_DATA
-from .utils import WSQueue, as_list
+from .utils import WSQueue, SHMRingQueue, as_tuple, encode_utf8, loads, dumps, get_logger
 
 
 class MarketData(object):
     """Websocket client session handler."""
 
-    # create a logger and set level to debug:
     _log: Logger = getLogger(__name__)
-    _log.setLevel(INFO)
 
-    # create console handler and set level to debug:
-    _console = StreamHandler()
-    _console.setLevel(INFO)
+    # reconnect delay: `_backoff * 2 ** attempt` seconds up to `_max_backoff`,
+    # plus up to a second of jitter:
+    _backoff: float = 1.0
+    _max_backoff: float = 60.0
 
-    # create formatter:
-    _formatter = Formatter(
-        "[%(asctime)s] - %(levelname)s - <%(filename)s, %(lineno)d, %(funcName)s>: %(message)s"
-    )
-
-    # add formatter to console:
-    _console.setFormatter(_formatter)
-
-    # add console to logger:
-    _log.addHandler(_console)
+    # `run_forever` options which need websocket-client to open the socket:
+    _socket_options: Tuple[str, ...] = ("sockopt", "sslopt", "http_proxy_host", "proxy_type")
 
     def __init__(
             self,
             key: str,
             secret: str,
             channel: str,
-            product_ids: Union[List[str], Tuple[str], str],
+            product_ids: Union[Sequence[str], str],
+            filter_keys: Iterable[str] = None,
+            reconnect: bool = True,
+            connect_timeout: float = 10,
+            transport: str = "queue",
+            ring_bytes: int = 64 << 20,
             debug: bool = False,
             logger: Logger = None,
     ):
@@ -48,99 +49,294 @@ class MarketData(object):
         :param secret: The API secret;
         :param channel: The channel to subscribe to.
         :param product_ids: Product IDs.
+        :param filter_keys: If given, only these top-level keys of each
+            message are put in the queue (i.e. `("channel", "events")`).
+        :param reconnect: Reconnect (with exponential backoff) and resubscribe
+            when the connection drops, keeping the same queue
+            (defaults to: `True`).
+        :param connect_timeout: Seconds allowed for the TCP/TLS connection
+            and the websocket handshake (defaults to: 10). Not applied when
+            `listen()` is given socket or proxy options.
+        :param transport: `"queue"` for an in-process `WSQueue` of decoded
+            messages, or `"shm"` for a `SHMRingQueue` of raw frames that a
+            consumer process attaches to by `queue.name` (defaults to:
+            `"queue"`). `filter_keys` does not apply to raw frames, the
+            client closes if the ring stays full for a second and `close()`
+            removes the shared memory (attached consumers keep reading it).
+        :param ring_bytes: Shared memory size with `transport="shm"`
+            (defaults to: 64 MiB).
         :param debug: Set to True to log all requests/responses to/from server
             (defaults to: `False`).
         :param logger: The handler to be used for logging. If given, and level
             is above `DEBUG`, all debug messages will be ignored.
         """
-        self._hmac = WSAuth(key=key, secret=secret)
-        self._channel = channel
-        self._product_ids = as_list(product_ids)
-        self._queue = WSQueue()
+        self._hmac: WSAuth = WSAuth(key=key, secret=secret)
+        self._channel: str = channel
+        self._product_ids: Tuple[str, ...] = as_tuple(product_ids)
+        self._joined_ids: str = ",".join(self._product_ids)
+        self._subscribe_params: dict = {
+            "type": "subscribe",
+            "channel": self._channel,
+            "product_ids": self._product_ids,
+        }
+        self._unsubscribe_message: bytes = dumps(
+            {
+                "type": "unsubscribe",
+                "channel": self._channel,
+                "product_ids": self._product_ids,
+            }
+        )
+        self._filter_keys: Optional[Tuple[str, ...]] = (
+            tuple(filter_keys) if filter_keys is not None else None
+        )
+        self._queue: Union[WSQueue, SHMRingQueue]
 
-        if debug is True:
-            self._log.setLevel(DEBUG)
-            self._console.setLevel(DEBUG)
+        if transport == "shm":
+            self._queue = SHMRingQueue(ring_bytes)
+        elif transport == "queue":
+            self._queue = WSQueue()
+        else:
+            raise ValueError(f"Unknown transport: '{transport}'!")
+
+        self._raw: bool = transport == "shm"
+
+        # bound once, `on_message` runs for every frame:
+        self._put: Callable = self._queue.put
 
         if logger is not None:
             self._log = logger
 
+        elif debug is True:
+            self._log = get_logger(__name__, debug=True)
+
+        self._url: str = f"wss://{MARKET_DATA}"
+
+        # created by `listen()`:
+        self._websocket: Optional[WebSocketApp] = None
+        self._socket: Optional[socket] = None
+        self._thread: Optional[Thread] = None
+        self._running: bool = False
+        self._closed: bool = False
+        self._run_args: tuple = ()
+        self._run_kwargs: dict = {}
+
+        self._reconnect: bool = reconnect
+        self._connect_timeout: float = connect_timeout
+        self._attempts: int = 0
+        self._closing: bool = False
+        self._timer: Optional[Timer] = None
+
+        # guards `_closing` against the connects running on other threads:
+        self._lock: Lock = Lock()
+
+    @property
+    def queue(self) -> Union[WSQueue, SHMRingQueue]:
+        return self._queue
+
+    def listen(self, *args, **kwargs):
+        """
+        Start the listener: connect and subscribe from a new thread, which
+        then reads the messages into the queue. Returns right away.
+
+        The arguments are passed on to `WebSocketApp.run_forever`, except
+        for `reconnect`: reconnecting is left to the `reconnect` parameter
+        of `MarketData`.
+        """
+        # websocket-client would reconnect through the already closed socket:
+        if kwargs.pop("reconnect", None):
+            warn(
+                "The run_forever `reconnect` option is ignored, use MarketData(reconnect=True)!",
+                RuntimeWarning,
+                stacklevel=2
+            )
+
+        self._run_args, self._run_kwargs = args, kwargs
+        self._attempts = 0
+        self._closing = self._closed = False
+        self._start()
+        self._log.debug("Listening for websocket client messages...")
+
+    def _start(self):
+        self._thread = Thread(target=self._connect, name="websocket")
+        self._thread.start()
+
+    def _connect(self):
+        with self._lock:
+            if self._closing is True:
+                return
+
         self._log.debug("Creating a new websocket client instance...")
 
-        self._websocket = WebSocketApp(
-            url=f"wss://{MARKET_DATA}",
+        try:
+            sock = self._open()
+        except OSError as exception:
+            self.on_error(None, exception)
+            self.on_close(None, None, None)
+            return
+
+        websocket = WebSocketApp(
+            url=self._url,
             on_open=self.on_open,
             on_message=self.on_message,
             on_error=self.on_error,
             on_close=self.on_close,
+            socket=sock,
         )
 
-    @property
-    def queue(self) -> WSQueue:
-        return self._queue
+        with self._lock:
+            if self._closing is True:  # closed while connecting
+                if sock is not None:
+                    sock.close()
+                return
 
-    def listen(self, *args, **kwargs):
-        """Start the listener."""
-        thread = Thread(
-            target=self._websocket.run_forever,
-            name="websocket",
-            args=args,
-            kwargs=kwargs
+            self._websocket, self._socket = websocket, sock
+            self._running = True
+
+        try:
+            websocket.run_forever(*self._run_args, **self._run_kwargs)
+
+        finally:
+            with self._lock:
+                self._running = False
+                release = self._closed
+
+            if release is True:
+                self._release()
+
+    def _open(self) -> Optional[socket]:
+        """
+        Open the TCP (and TLS) connection with `connect_timeout`, which then
+        bounds the websocket handshake as well, until `on_open` clears it.
+        """
+        if any(name in self._run_kwargs for name in self._socket_options):
+            return None  # left to websocket-client, without a timeout
+
+        url = urlsplit(self._url)
+        secure = url.scheme == "wss"
+        sock = create_connection(
+            (url.hostname, url.port or (443 if secure else 80)),
+            timeout=self._connect_timeout
         )
-        thread.start()
-        self._log.debug("Listening for websocket client messages...")
+
+        if secure is True:
+            try:
+                sock = create_default_context().wrap_socket(sock, server_hostname=url.hostname)
+            except OSError:
+                sock.close()
+                raise
+
+        return sock
 
     def close(self):
-        self.unsubscribe(self._websocket)
-        self._websocket.close()
+        with self._lock:
+            self._closing = True
+            websocket, sock = self._websocket, self._socket
+
+            if self._timer is not None:
+                self._timer.cancel()
+
+        if websocket is not None:
+            # `listen()` returns before the handshake, which may not be done yet:
+            if websocket.sock is not None and websocket.sock.connected:
+                self.unsubscribe(websocket)
+            websocket.close()
+
+        if sock is not None:  # wakes up a pending handshake
+            try:
+                sock.shutdown(SHUT_RDWR)
+            except OSError:
+                pass
+
         self._queue.close()
 
+        # else released by the connection, once it can put no more frames:
+        with self._lock:
+            self._closed = True
+            release = self._running is False
+
+        if release is True:
+            self._release()
+
+    def _release(self):
+        """Remove the shared memory created for `transport="shm"`."""
+        if self._raw is True:
+            self._queue.release()
+
     def on_open(self, websocket: WebSocketApp):
         """Action taken on websocket open event."""
+        if self._closing is True:  # closed during the handshake
+            websocket.close()
+            return
+
+        websocket.sock.settimeout(None)  # quiet channels are not a failure
+        self._attempts = 0
         self.subscribe(websocket)
 
     def on_message(self, websocket: WebSocketApp, message: str):
         """Action taken for each message received."""
-        message = loads(message)
+        # raw frames are decoded by the consumer, only possible errors are parsed:
+        if self._raw is True and '"error"' not in message:
+            self._put_frame(message)
+            return
+
+        data = loads(message)
+        error = data.get("type") == "error"
+
+        if error is True:
+            self._log.error("%s! %s!", data.get("message"), data.get("reason"))
+
+        elif self._filter_keys is not None:
+            data = {key: data[key] for key in self._filter_keys if key in data}
 
-        if message.get("type").lower() == "error":
-            self._log.error(f"{message.get('message')}! {message.get('reason')}!")
+        # queued before closing, so the consumer gets it ahead of the exit signal:
+        if self._raw is True:
+            self._put_frame(message)
+        else:
+            self._put(data)
+
+        if error is True:
             self.close()
 
-        self._queue.put(message)
+    def _put_frame(self, message: str):
+        try:
+            self._put(encode_utf8(message))
+        except Full:
+            self._log.error("The shared memory consumer is not keeping up, closing!")
+            self.close()
 
     def on_close(self, websocket: WebSocketApp, status, reason):
         """Action taken on websocket close event."""
         self._log.debug("The websocket client instance was terminated.")
 
+        if self._reconnect is True and self._closing is False:
+            delay = min(self._backoff * 2 ** self._attempts, self._max_backoff) + uniform(0, 1)
+            self._attempts += 1
+            self._log.debug("Reconnecting in %.1f seconds...", delay)
+            self._timer = Timer(delay, self._start)
+            self._timer.daemon = True
+            self._timer.start()
+
     def on_error(self, websocket: WebSocketApp, exception):
         """Action taken when exception occurs."""
         self._log.error("Websocket client failed!", exc_info=exception)
 
     def subscribe(self, websocket: WebSocketApp):
         self._log.debug(
-            f"Subscribing to channel '{self._channel}' "
-            f"for product ids '{', '.join(self._product_ids)}'..."
+            "Subscribing to channel '%s' for product ids '%s'...",
+            self._channel,
+            self._joined_ids
         )
-        params = {
-            "type": "subscribe",
-            "channel": self._channel,
-            "product_ids": self._product_ids,
-        }
-        self._hmac.sign(params)
+        params = self._subscribe_params.copy()
+        self._hmac.sign(params, self._joined_ids)
         websocket.send(dumps(params))
 
     def unsubscribe(self, websocket: WebSocketApp):
         self._log.debug(
-            f"Unsubscribing from channel '{self._channel}' "
-            f"for product ids '{', '.join(self._product_ids)}'..."
+            "Unsubscribing from channel '%s' for product ids '%s'...",
+            self._channel,
+            self._joined_ids
         )
-        params = {
-            "type": "unsubscribe",
-            "channel": self._channel,
-            "product_ids": self._product_ids,
-        }
-        websocket.send(dumps(params))
+        websocket.send(self._unsubscribe_message)
 
 
 __all__ = ["MarketData"]
@@ -0,0 +1,86 @@
+# -*- coding: UTF-8 -*-
+
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import environ
+from threading import Thread
+from unittest.mock import patch
+
+from requests import HTTPError
+
+from cb_advanced_trade.constants import TRACE
+from cb_advanced_trade.endpoints import Orders
+
+
+class Handler(BaseHTTPRequestHandler):
+    """JSON for `/ok`, a proxy style HTML 502 page for everything else."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path.startswith("/orders/ok"):
+            status, body = 200, b'{"ok":true}'
+        else:
+            status, body = 502, b"<html><body>Bad Gateway</body></html>"
+
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestAdvancedTrade(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def endpoint(self, **kwargs) -> Orders:
+        orders = Orders("key", "secret", cache=False, retries=0, **kwargs)
+        orders._endpoint_url = "http://127.0.0.1:%d/orders" % self.server.server_port
+        self.addCleanup(orders.close)
+        return orders
+
+    def test_non_json_error_raises_http_error(self):
+        for http2 in (False, True):
+            with self.subTest(http2=http2):
+                orders = self.endpoint(http2=http2)
+
+                self.assertEqual(orders._get("ok"), {"ok": True})
+
+                with self.assertRaisesRegex(HTTPError, "502 Server Error: Bad Gateway"):
+                    orders._get("gateway")
+
+    def test_http2_ignores_session_options(self):
+        with self.assertWarnsRegex(RuntimeWarning, "backoff"):
+            Orders("key", "secret", http2=True, cache=True, backoff=2).close()
+
+    def test_http2_trace(self):
+        with patch.dict(environ, {TRACE: "1"}):
+            orders = self.endpoint(http2=True, debug=True)
+
+        with self.assertLogs(orders._session._log, level="DEBUG") as logs:
+            orders._get("ok")
+
+        self.assertIn("< GET /orders/ok", logs.output[0])
+        self.assertIn('{"ok":true}', logs.output[0])
+
+    def test_user_subclass_keeps_the_endpoint(self):
+        class MyOrders(Orders):
+            pass
+
+        self.assertEqual(MyOrders._endpoint, Orders._endpoint)
+        self.assertEqual(MyOrders._endpoint_url, Orders._endpoint_url)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+# -*- coding: UTF-8 -*-
+
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import environ
+from threading import Thread
+from unittest.mock import patch
+
+from cb_advanced_trade.constants import TRACE
+from cb_advanced_trade.sessions import AuthSession
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'{"ok":true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestAuthSession(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        cls.url = "http://127.0.0.1:%d/products" % cls.server.server_port
+        Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_trace_cache_hit(self):
+        with patch.dict(environ, {TRACE: "1"}):
+            session = AuthSession("key", "secret", debug=True)
+
+        self.addCleanup(session.close)
+
+        with self.assertLogs(session._log, level="DEBUG") as logs:
+            first = session.get(self.url)
+            second = session.get(self.url)
+
+        self.assertFalse(first.from_cache)
+        self.assertTrue(second.from_cache)
+        self.assertIn("< GET /products", logs.output[0])
+        self.assertIn("GET %s -> 200" % self.url, logs.output[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+# -*- coding: UTF-8 -*-
+
+import unittest
+from collections import deque
+from multiprocessing import get_context
+from os import environ, pathsep
+from os.path import dirname
+from queue import Full
+from subprocess import run, PIPE
+from sys import version_info, executable
+
+import cb_advanced_trade
+from cb_advanced_trade.utils import WSQueue, SHMRingQueue, dumps
+
+# consumer started as an unrelated process, with a resource tracker of its own:
+CONSUMER = """
+import sys
+from cb_advanced_trade.utils import SHMRingQueue
+
+queue = SHMRingQueue.attach(sys.argv[1])
+print(len(list(queue)))
+queue.release()
+"""
+
+
+def consume(name: str, results):
+    """Consumer process: attach, decode everything, report back."""
+    queue = SHMRingQueue.attach(name)
+    results.put([message["sequence"] for message in queue])
+    queue.release()
+
+
+class Interleaved(deque):
+    """
+    Runs `hook` once, right after the consumer first finds it empty
+    (the window between draining and checking for the exit signal).
+    """
+
+    def __init__(self, hook):
+        super(Interleaved, self).__init__()
+        self._hook = hook
+
+    def __len__(self):
+        size = super(Interleaved, self).__len__()
+
+        if size == 0 and self._hook is not None:
+            hook, self._hook = self._hook, None
+            hook()
+
+        return size
+
+
+class TestWSQueue(unittest.TestCase):
+
+    def test_iter_yields_backlog_then_stops(self):
+        queue = WSQueue()
+
+        for item in "abc":
+            queue.put(item)
+
+        queue.close()
+
+        self.assertEqual(list(queue), ["a", "b", "c"])
+
+    def test_put_and_close_after_drain_is_not_lost(self):
+        queue = WSQueue()
+
+        def producer():
+            queue.put("error-frame")
+            queue.close()
+
+        queue._items = Interleaved(producer)
+        queue.put("a")
+
+        consumed = []
+
+        for item in queue:
+            consumed.append(item)
+
+        self.assertEqual(consumed, ["a", "error-frame"])
+
+
+
+@unittest.skipIf(version_info < (3, 8), "multiprocessing.shared_memory requires Python 3.8")
+class TestSHMRingQueue(unittest.TestCase):
+
+    def test_round_trip_across_processes(self):
+        # small enough to wrap around (and split frames) many times over:
+        queue = SHMRingQueue(1024)
+        self.addCleanup(queue.release)
+
+        context = get_context("spawn")
+        results = context.Queue()
+        consumer = context.Process(target=consume, args=(queue.name, results))
+        consumer.start()
+
+        count = 5000
+
+        for sequence in range(count):
+            queue.put(dumps({"sequence": sequence, "pad": "x" * (sequence % 97)}), timeout=None)
+
+        queue.close()
+
+        self.assertEqual(results.get(timeout=60), list(range(count)))
+        consumer.join(10)
+
+    def test_independent_consumer_leaves_the_segment(self):
+        queue = SHMRingQueue(1024)
+        self.addCleanup(queue.release)
+
+        for sequence in range(10):
+            queue.put(dumps({"sequence": sequence}))
+
+        queue.close()
+
+        env = dict(environ)
+        env["PYTHONPATH"] = pathsep.join(
+            filter(None, [dirname(dirname(cb_advanced_trade.__file__)), env.get("PYTHONPATH")])
+        )
+        consumer = run(
+            [executable, "-c", CONSUMER, queue.name],
+            stdout=PIPE,
+            stderr=PIPE,
+            env=env,
+            timeout=60,
+        )
+
+        self.assertEqual(consumer.stdout.strip(), b"10")
+        self.assertNotIn(b"leaked", consumer.stderr)
+
+        # still there for the producer, and for a consumer attaching later:
+        SHMRingQueue.attach(queue.name).release()
+        queue.release()
+        queue.release()
+
+    def test_put_gives_up_when_full(self):
+        queue = SHMRingQueue(64)
+        self.addCleanup(queue.release)
+
+        queue.put(b"x" * 40)
+
+        with self.assertRaises(Full):
+            queue.put(b"y" * 40, timeout=0.05)
+
+        with self.assertRaises(ValueError):
+            queue.put(b"z" * 64)
+
+        self.assertEqual(queue.get(), b"x" * 40)
+        queue.put(b"y" * 40, timeout=0.05)  # wraps around
+        queue.close()
+        self.assertEqual(queue.get(), b"y" * 40)
+        self.assertIsNone(queue.get())
+
+
+if __name__ == "__main__":
+    unittest.main()
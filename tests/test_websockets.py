@@ -0,0 +1,295 @@
+# -*- coding: UTF-8 -*-
+
+import unittest
+from base64 import b64encode
+from hashlib import sha1
+from json import dumps
+from socket import create_server, SHUT_RDWR
+from struct import pack
+from sys import version_info
+from threading import Thread, Event
+from time import monotonic, sleep
+
+from cb_advanced_trade.utils import SHMRingQueue
+from cb_advanced_trade.websockets import MarketData
+
+GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def frame(payload: bytes) -> bytes:
+    """Unmasked text frame, as sent by a server."""
+    if len(payload) < 126:
+        return pack("!BB", 0x81, len(payload)) + payload
+    return pack("!BBH", 0x81, 126, len(payload)) + payload
+
+
+class FrameServer(object):
+    """
+    Minimal websocket server streaming ticker frames to every client.
+
+    :param handshake: Answer the opening handshake (else hold the
+        connection open without a reply).
+    :param stall: After the handshake, send a frame header and hold back
+        its payload for `stall` seconds.
+    """
+
+    def __init__(self, handshake: bool = True, stall: float = 0, interval: float = 0.02):
+        self._handshake = handshake
+        self._stall = stall
+        self._interval = interval
+        self._stopped = Event()
+        self._connections = []
+        self.accepted = 0
+
+        self._sock = create_server(("127.0.0.1", 0))
+        self.url = "ws://127.0.0.1:%d" % self._sock.getsockname()[1]
+        Thread(target=self._accept, daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+
+        for sock in [self._sock] + self._connections:
+            try:
+                sock.shutdown(SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def _accept(self):
+        while not self._stopped.is_set():
+            try:
+                sock, _ = self._sock.accept()
+            except OSError:
+                return
+
+            self.accepted += 1
+            self._connections.append(sock)
+            Thread(target=self._serve, args=(sock,), daemon=True).start()
+
+    def _serve(self, sock):
+        try:
+            request = b""
+
+            while b"\r\n\r\n" not in request:
+                request += sock.recv(4096)
+
+            if self._handshake is False:
+                self._stopped.wait()
+                return
+
+            key = request.split(b"Sec-WebSocket-Key: ")[1].split(b"\r\n")[0]
+            accept = b64encode(sha1(key + GUID).digest())
+            sock.sendall(
+                b"HTTP/1.1 101 Switching Protocols\r\n"
+                b"Upgrade: websocket\r\n"
+                b"Connection: Upgrade\r\n"
+                b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+            )
+
+            if self._stall:
+                message = frame(dumps({"channel": "ticker", "pad": "x" * 200}).encode())
+                sock.sendall(message[:4])
+                self._stopped.wait(self._stall)
+                sock.sendall(message[4:])
+
+            sequence = 0
+
+            while not self._stopped.wait(self._interval):
+                sock.sendall(frame(dumps({"channel": "ticker", "sequence": sequence}).encode()))
+                sequence += 1
+
+        except OSError:
+            pass
+
+
+def client(url: str, **kwargs) -> MarketData:
+    market_data = MarketData("key", "secret", "ticker", "BTC-USD", reconnect=False, **kwargs)
+    market_data._url = url
+    return market_data
+
+
+def connected(market_data: MarketData, timeout: float = 2) -> bool:
+    deadline = monotonic() + timeout
+
+    while monotonic() < deadline:
+        websocket = market_data._websocket
+
+        if websocket is not None and websocket.sock is not None and websocket.sock.connected:
+            return True
+
+        sleep(0.01)
+
+    return False
+
+
+class TestMarketData(unittest.TestCase):
+
+    def test_stalled_socket_does_not_block_others(self):
+        stalled, healthy = FrameServer(stall=3), FrameServer()
+        first, second = client(stalled.url), client(healthy.url)
+
+        try:
+            first.listen()
+            sleep(0.2)  # the first one is now stuck mid-frame
+            second.listen()
+            sleep(1.5)
+
+            self.assertGreater(len(second.queue.drain()), 20)
+            self.assertEqual(first.queue.drain(), [])
+
+        finally:
+            first.close()
+            second.close()
+            stalled.stop()
+            healthy.stop()
+
+    def test_listen_returns_before_the_handshake(self):
+        server = FrameServer(handshake=False)
+        market_data = client(server.url)
+
+        try:
+            start = monotonic()
+            market_data.listen()
+            self.assertLess(monotonic() - start, 0.5)
+
+            while server.accepted == 0 and monotonic() - start < 2:
+                sleep(0.01)
+
+        finally:
+            market_data.close()
+            server.stop()
+
+    def test_close_before_connected(self):
+        server = FrameServer()
+        market_data = client(server.url)
+
+        try:
+            market_data.listen()
+            market_data.close()
+            sleep(1)
+
+            self.assertEqual(market_data.queue.drain(), [])
+            self.assertFalse(market_data._thread.is_alive())
+
+        finally:
+            server.stop()
+
+    def test_close_during_handshake(self):
+        server = FrameServer(handshake=False)
+        market_data = client(server.url)
+
+        try:
+            market_data.listen()
+
+            while server.accepted == 0:
+                sleep(0.01)
+
+            market_data.close()
+            market_data._thread.join(1)
+            self.assertFalse(market_data._thread.is_alive())
+
+        finally:
+            server.stop()
+
+    def test_listen_ignores_run_forever_reconnect(self):
+        server = FrameServer()
+        market_data = client(server.url)
+
+        try:
+            with self.assertWarnsRegex(RuntimeWarning, "reconnect"):
+                market_data.listen(reconnect=1)
+
+            self.assertTrue(connected(market_data))
+            sleep(0.3)
+            self.assertGreater(len(market_data.queue.drain()), 0)
+
+        finally:
+            market_data.close()
+            server.stop()
+
+    def test_ping_timeout_closes_dead_connection(self):
+        server = FrameServer(interval=60)  # silent, and never answers pings
+        market_data = client(server.url)
+        closed = Event()
+        on_close = market_data.on_close
+
+        def closing(*args):
+            closed.set()
+            on_close(*args)
+
+        market_data.on_close = closing
+
+        try:
+            with self.assertLogs("cb_advanced_trade.websockets", level="ERROR"):
+                market_data.listen(ping_interval=1, ping_timeout=0.5)
+                self.assertTrue(closed.wait(5))
+
+        finally:
+            market_data.close()
+            server.stop()
+
+    def test_close_quiet_connection(self):
+        server = FrameServer(interval=60)
+        market_data = client(server.url)
+
+        try:
+            market_data.listen()
+            self.assertTrue(connected(market_data))
+
+            start = monotonic()
+            market_data.close()
+            self.assertLess(monotonic() - start, 4)
+
+        finally:
+            server.stop()
+
+    @unittest.skipIf(version_info < (3, 8), "multiprocessing.shared_memory requires Python 3.8")
+    def test_close_removes_shared_memory(self):
+        server = FrameServer()
+        market_data = client(server.url, transport="shm", ring_bytes=1 << 16)
+        name = market_data.queue.name
+
+        try:
+            market_data.listen()
+            self.assertTrue(connected(market_data))
+            consumer = SHMRingQueue.attach(name)
+            sleep(0.2)
+
+        finally:
+            market_data.close()
+            server.stop()
+
+        market_data._thread.join(5)
+        self.assertIsNotNone(consumer.get())  # attached consumers keep reading
+        consumer.release()
+
+        with self.assertRaises(FileNotFoundError):
+            SHMRingQueue.attach(name)
+
+    def test_reconnect_handshake_times_out(self):
+        blackhole, healthy = FrameServer(handshake=False), FrameServer()
+        stuck = client(blackhole.url, connect_timeout=0.3)
+        stuck._reconnect, stuck._backoff = True, 0.01  # plus up to a second of jitter
+        second = client(healthy.url)
+
+        try:
+            with self.assertLogs("cb_advanced_trade.websockets", level="ERROR"):
+                stuck.listen()
+                second.listen()
+                deadline = monotonic() + 5
+
+                while blackhole.accepted < 3 and monotonic() < deadline:
+                    sleep(0.05)
+
+            self.assertGreaterEqual(blackhole.accepted, 3)
+            self.assertGreater(len(second.queue.drain()), 20)
+
+        finally:
+            stuck.close()
+            second.close()
+            blackhole.stop()
+            healthy.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()